@@ -17,6 +17,9 @@ NGROK_PORT = 8000
 SERVER_PORT = 8001
 EXTERNAL_PORT = 8002
 ENV_FILE = Path(SERVER_DIR) / ".env"
+# Set ULTRON_REVERSE_LINK=1 to have the on-device service dial the gateway
+# over WebSocket instead of exposing it through an ngrok tunnel
+USE_REVERSE_LINK = os.getenv("ULTRON_REVERSE_LINK") == "1"
 
 processes = []
 stop_event = threading.Event()
@@ -28,12 +31,13 @@ def log(msg, service="SYSTEM"):
     print(f"[{timestamp}] [{service}] {msg}")
 
 
-def run_service(name, cmd, cwd=None):
+def run_service(name, cmd, cwd=None, env=None):
     """Runs a service in a separate process."""
     log(f"Starting {name}...", name)
     process = subprocess.Popen(
         cmd,
         cwd=cwd,
+        env={**os.environ, **env} if env else None,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         text=True,
@@ -182,24 +186,40 @@ def main():
     run_service("EXTERNAL", "node index.js", cwd=EXTERNAL_DIR)
 
     # 2. Start On-Device Service
-    run_service("ONDEVICE", "uvicorn app:app --port 8000", cwd=ONDEVICE_DIR)
+    ondevice_env = None
+    if USE_REVERSE_LINK:
+        # The link retries until the gateway below is up
+        ondevice_env = {
+            "GATEWAY_LINK_URL": f"ws://localhost:{SERVER_PORT}/workers/connect"
+        }
+    run_service(
+        "ONDEVICE", "uvicorn app:app --port 8000", cwd=ONDEVICE_DIR, env=ondevice_env
+    )
     if not wait_for_health("localhost:8000", "ONDEVICE"):
         cleanup()
 
-    # 3. Start ngrok
-    run_service("NGROK", f"ngrok http {NGROK_PORT}")
-    ngrok_url = get_ngrok_url()
-    if ngrok_url:
-        log(f"CAPTURE: Public ngrok URL: {ngrok_url}", "NGROK")
-        update_env(ngrok_url)
+    # 3. Start ngrok (not needed when the on-device service dials out)
+    if USE_REVERSE_LINK:
+        log("Reverse link mode: skipping ngrok and .env update", "SYSTEM")
     else:
-        log(
-            "CRITICAL: Could not capture ngrok URL. Gateway might use old URL.",
-            "SYSTEM",
-        )
+        run_service("NGROK", f"ngrok http {NGROK_PORT}")
+        ngrok_url = get_ngrok_url()
+        if ngrok_url:
+            log(f"CAPTURE: Public ngrok URL: {ngrok_url}", "NGROK")
+            update_env(ngrok_url)
+        else:
+            log(
+                "CRITICAL: Could not capture ngrok URL. Gateway might use old URL.",
+                "SYSTEM",
+            )
 
     # 4. Start Server Gateway
-    run_service("SERVER", "uvicorn main:app --port 8001", cwd=SERVER_DIR)
+    run_service(
+        "SERVER",
+        "uvicorn main:app --port 8001",
+        cwd=SERVER_DIR,
+        env={"LAPTOP_TRANSPORT": "link"} if USE_REVERSE_LINK else None,
+    )
     if not wait_for_health("localhost:8001", "SERVER"):
         cleanup()
 
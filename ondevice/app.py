@@ -1,7 +1,12 @@
+import asyncio
 from fastapi import FastAPI, Header, HTTPException, Depends, Request
 from models import GenerateRequest, GenerateResponse
 from ollama_client import generate_text
 from config import settings
+from sessions import session_store
+from gateway_link import GatewayLink
+from contextlib import asynccontextmanager
+import diagnostics
 import logging
 import time
 
@@ -10,7 +15,37 @@ import time
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="On-Device Ollama Service")
+lag_monitor = diagnostics.LoopLagMonitor(
+    settings.LOOP_LAG_THRESHOLD_MS, settings.LOOP_LAG_INTERVAL_MS
+)
+gateway_link = GatewayLink(settings.GATEWAY_LINK_URL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DIAGNOSTICS_ENABLED:
+        lag_monitor.start()
+        logger.info("Diagnostics enabled: loop lag monitor started")
+
+    link_task = None
+    if settings.GATEWAY_LINK_URL:
+        link_task = asyncio.create_task(gateway_link.run())
+        logger.info(f"Gateway link enabled: {settings.GATEWAY_LINK_URL}")
+
+    yield
+
+    if link_task:
+        link_task.cancel()
+        try:
+            await link_task
+        except asyncio.CancelledError:
+            pass
+
+    if settings.DIAGNOSTICS_ENABLED:
+        await lag_monitor.stop()
+
+
+app = FastAPI(title="On-Device Ollama Service", lifespan=lifespan)
 
 
 @app.middleware("http")
@@ -48,13 +83,30 @@ async def verify_secret(x_secret: str = Header(...)):
     return x_secret
 
 
+if settings.DIAGNOSTICS_ENABLED:
+    diagnostics.install(
+        app,
+        lag_monitor,
+        diagnostics.SlowRequestRecorder(settings.SLOW_REQUEST_MS),
+        dependencies=[Depends(verify_secret)],
+        max_profile_seconds=settings.PROFILE_MAX_SECONDS,
+    )
+
+
 @app.post("/generate", response_model=GenerateResponse)
 async def generate(request: GenerateRequest, _=Depends(verify_secret)):
     logger.info(f"Received generation request for prompt: {request.prompt[:50]}...")
     try:
-        content = await generate_text(request.prompt)
+        result = await generate_text(
+            request.prompt,
+            model=request.model,
+            num_predict=request.num_predict,
+            num_ctx=request.num_ctx,
+            temperature=request.temperature,
+            session_id=request.session_id,
+        )
         logger.info("Generation successful")
-        return GenerateResponse(generated_content=content)
+        return GenerateResponse(**result)
     except Exception as e:
         logger.error(f"Generation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -62,4 +114,10 @@ async def generate(request: GenerateRequest, _=Depends(verify_secret)):
 
 @app.get("/health")
 async def health():
-    return {"status": "ok", "model": settings.OLLAMA_MODEL}
+    return {
+        "status": "ok",
+        "model": settings.OLLAMA_MODEL,
+        "sessions": len(session_store),
+        "session_context_tokens": session_store.total_tokens,
+        "gateway_link": gateway_link.connected if settings.GATEWAY_LINK_URL else None,
+    }
@@ -1,10 +1,35 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional
+import socket
 
 
 class Settings(BaseSettings):
     OLLAMA_MODEL: str = "llama3"
     SHARED_SECRET: str
 
+    # Upper bounds for per-request generation options
+    MAX_NUM_PREDICT: int = 8192
+    MAX_NUM_CTX: int = 32768
+
+    # Conversation context kept per session_id (LRU, idle TTL, total token cap)
+    SESSION_TTL_SECONDS: float = 1800
+    SESSION_MAX_COUNT: int = 100
+    SESSION_MAX_CONTEXT_TOKENS: int = 500000
+
+    # Reverse link: when set, dial out to the gateway's WebSocket (e.g.
+    # ws://gateway:8001/workers/connect) and receive jobs over it
+    GATEWAY_LINK_URL: Optional[str] = None
+    WORKER_NAME: str = socket.gethostname()
+    LINK_MAX_JOBS: int = 4
+    LINK_MAX_RECONNECT_DELAY: float = 30
+
+    # Runtime diagnostics (/debug/* endpoints), off unless explicitly enabled
+    DIAGNOSTICS_ENABLED: bool = False
+    LOOP_LAG_THRESHOLD_MS: float = 250
+    LOOP_LAG_INTERVAL_MS: float = 100
+    SLOW_REQUEST_MS: float = 5000
+    PROFILE_MAX_SECONDS: float = 30
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+import random
+
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+from config import settings
+from models import GenerateRequest
+from ollama_client import generate_text
+
+
+logger = logging.getLogger(__name__)
+
+# How long to wait for the gateway's welcome after connecting
+HANDSHAKE_TIMEOUT_SECONDS = 30
+# Close code the gateway uses when a newer connection takes over our name
+REPLACED_CLOSE_CODE = 4000
+
+
+class GatewayLink:
+    """
+    Outbound connection to the gateway's /workers/connect WebSocket.
+
+    Instead of the gateway calling /generate through a tunnel, this service
+    dials out once and receives jobs over the link. Jobs run concurrently and
+    their results (and optionally streamed chunks) are tagged with the job id.
+    The link answers heartbeats, treats a silent gateway as dead, and
+    reconnects with capped exponential backoff.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.connected = False
+        self._jobs = set()
+
+    async def _send(self, websocket, message: dict):
+        await websocket.send(json.dumps(message))
+
+    async def _run_job(self, websocket, message: dict):
+        job_id = message["id"]
+        try:
+            request = GenerateRequest(**message["request"])
+            logger.info(f"Link job {job_id}: {request.prompt[:50]}...")
+
+            on_chunk = None
+            if message.get("stream"):
+
+                async def on_chunk(text: str):
+                    await self._send(
+                        websocket, {"type": "chunk", "id": job_id, "text": text}
+                    )
+
+            result = await generate_text(
+                request.prompt,
+                model=request.model,
+                num_predict=request.num_predict,
+                num_ctx=request.num_ctx,
+                temperature=request.temperature,
+                session_id=request.session_id,
+                on_chunk=on_chunk,
+            )
+            await self._send(
+                websocket, {"type": "result", "id": job_id, "response": result}
+            )
+            logger.info(f"Link job {job_id} complete")
+        except ConnectionClosed:
+            logger.warning(f"Link closed before job {job_id} could be returned")
+        except Exception as e:
+            logger.error(f"Link job {job_id} failed: {str(e)}")
+            try:
+                await self._send(
+                    websocket, {"type": "error", "id": job_id, "detail": str(e)}
+                )
+            except ConnectionClosed:
+                pass
+
+    async def _serve(self, websocket):
+        await self._send(
+            websocket,
+            {
+                "type": "hello",
+                "worker": settings.WORKER_NAME,
+                "model": settings.OLLAMA_MODEL,
+                "max_jobs": settings.LINK_MAX_JOBS,
+            },
+        )
+        welcome = json.loads(
+            await asyncio.wait_for(websocket.recv(), timeout=HANDSHAKE_TIMEOUT_SECONDS)
+        )
+        if welcome.get("type") != "welcome":
+            raise ConnectionError(f"Expected welcome from gateway, got {welcome.get('type')}")
+        # The gateway announces its ping interval; silence means a dead link
+        idle_timeout = welcome["heartbeat_seconds"] * 3
+        while True:
+            raw = await asyncio.wait_for(websocket.recv(), timeout=idle_timeout)
+            message = json.loads(raw)
+            if message["type"] == "ping":
+                await self._send(websocket, {"type": "pong"})
+            elif message["type"] == "job":
+                task = asyncio.create_task(self._run_job(websocket, message))
+                self._jobs.add(task)
+                task.add_done_callback(self._jobs.discard)
+
+    async def run(self):
+        headers = {"X-SECRET": settings.SHARED_SECRET}
+        delay = 1
+        while True:
+            try:
+                async with connect(
+                    self.url, additional_headers=headers, ping_interval=None
+                ) as websocket:
+                    logger.info(f"Connected to gateway link at {self.url}")
+                    self.connected = True
+                    delay = 1
+                    await self._serve(websocket)
+            except asyncio.CancelledError:
+                raise
+            except ConnectionClosed as e:
+                if e.rcvd and e.rcvd.code == REPLACED_CLOSE_CODE:
+                    # Either our own stale connection, or another laptop is
+                    # using the same name and the two keep replacing each other
+                    logger.error(
+                        f"Gateway replaced this link with a newer connection named "
+                        f"{settings.WORKER_NAME!r}; set a unique WORKER_NAME per laptop"
+                    )
+                else:
+                    logger.warning(f"Gateway link lost: {e!r}")
+            except Exception as e:
+                logger.warning(f"Gateway link lost: {e!r}")
+            finally:
+                self.connected = False
+                # Results of in-flight jobs can no longer be delivered
+                for task in list(self._jobs):
+                    task.cancel()
+
+            # Jitter keeps several laptops from reconnecting in lockstep
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+            delay = min(delay * 2, settings.LINK_MAX_RECONNECT_DELAY)
@@ -1,9 +1,21 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
 
 
 class GenerateRequest(BaseModel):
     prompt: str
+    # Optional per-request generation settings, defaults come from config
+    model: Optional[str] = None
+    num_predict: Optional[int] = Field(default=None, gt=0)
+    num_ctx: Optional[int] = Field(default=None, gt=0)
+    temperature: Optional[float] = Field(default=None, ge=0)
+    # Reuse the conversation context of earlier prompts in the same session
+    session_id: Optional[str] = None
 
 
 class GenerateResponse(BaseModel):
     generated_content: str
+    model: Optional[str] = None
+    prompt_eval_count: Optional[int] = None
+    eval_count: Optional[int] = None
+    eval_seconds: Optional[float] = None
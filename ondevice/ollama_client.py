@@ -1,18 +1,97 @@
 import ollama
 from config import settings
+from sessions import session_store
+from typing import Awaitable, Callable, Optional
 import time
 
 
-async def generate_text(prompt: str) -> str:
+client = ollama.AsyncClient()
+
+
+def build_options(
+    num_predict: Optional[int] = None,
+    num_ctx: Optional[int] = None,
+    temperature: Optional[float] = None,
+) -> dict:
+    """Ollama options for a request, clamped to the configured limits."""
+    options = {}
+    if num_predict is not None:
+        options["num_predict"] = min(num_predict, settings.MAX_NUM_PREDICT)
+    if num_ctx is not None:
+        options["num_ctx"] = min(num_ctx, settings.MAX_NUM_CTX)
+    if temperature is not None:
+        options["temperature"] = temperature
+    return options
+
+
+async def generate_text(
+    prompt: str,
+    model: Optional[str] = None,
+    num_predict: Optional[int] = None,
+    num_ctx: Optional[int] = None,
+    temperature: Optional[float] = None,
+    session_id: Optional[str] = None,
+    on_chunk: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> dict:
     """
     Generates text using the local Ollama service.
+    Returns the content along with the model used and its token counts.
+
+    With a session_id, the context returned by the previous generation in that
+    session is passed back to Ollama, so only the new prompt is evaluated.
+
+    With on_chunk, the generation is streamed and each text chunk is handed to
+    the callback as it arrives.
     """
-    print(f"DEBUG: Starting Ollama generation with model: {settings.OLLAMA_MODEL}")
-    start = time.time()
-    response = ollama.generate(
-        model=settings.OLLAMA_MODEL,
-        prompt=prompt,
+    async with session_store.turn(session_id):
+        return await _generate(
+            prompt, model, num_predict, num_ctx, temperature, session_id, on_chunk
+        )
+
+
+async def _generate(
+    prompt: str,
+    model: Optional[str],
+    num_predict: Optional[int],
+    num_ctx: Optional[int],
+    temperature: Optional[float],
+    session_id: Optional[str],
+    on_chunk: Optional[Callable[[str], Awaitable[None]]],
+) -> dict:
+    model = model or settings.OLLAMA_MODEL
+    options = build_options(num_predict, num_ctx, temperature)
+    context = session_store.get(session_id, model) if session_id else None
+    print(
+        f"DEBUG: Starting Ollama generation with model: {model} options: {options}"
+        f" session: {session_id} context tokens: {len(context) if context else 0}"
     )
+    start = time.time()
+    if on_chunk is None:
+        response = await client.generate(
+            model=model, prompt=prompt, options=options, context=context
+        )
+        content = response["response"]
+    else:
+        parts = []
+        async for part in await client.generate(
+            model=model, prompt=prompt, options=options, context=context, stream=True
+        ):
+            if part["response"]:
+                parts.append(part["response"])
+                await on_chunk(part["response"])
+            # The final part carries the context and token counts
+            response = part
+        content = "".join(parts)
     duration = time.time() - start
     print(f"DEBUG: Ollama generation finished in {duration:.2f}s")
-    return response["response"]
+    if session_id and response.get("context"):
+        session_store.put(session_id, model, list(response["context"]))
+    eval_duration = response.get("eval_duration")
+    return {
+        "generated_content": content,
+        "model": model,
+        "prompt_eval_count": response.get("prompt_eval_count"),
+        "eval_count": response.get("eval_count"),
+        # Ollama reports durations in nanoseconds
+        "eval_seconds": eval_duration / 1e9 if eval_duration else None,
+    }
@@ -0,0 +1,114 @@
+import asyncio
+import collections
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """
+    Ollama `context` token state per session, so follow-up prompts only pay
+    for their new tokens.
+
+    Entries are kept in LRU order and evicted when idle longer than `ttl`, when
+    there are more than `max_sessions`, or when the total number of stored
+    context tokens exceeds `max_tokens`.
+    """
+
+    def __init__(self, ttl: float, max_sessions: int, max_tokens: int):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_tokens = max_tokens
+        self.total_tokens = 0
+        self._entries = collections.OrderedDict()
+        # session_id -> [lock, number of generations holding or awaiting it]
+        self._turn_locks = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @asynccontextmanager
+    async def turn(self, session_id: Optional[str]):
+        """
+        Serializes generations within a session. Each turn reads the context
+        left by the previous one and stores its own, so two concurrent
+        follow-ups would otherwise both build on the same context and the
+        later one would overwrite the other's turn.
+        """
+        if session_id is None:
+            yield
+            return
+        entry = self._turn_locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._turn_locks[session_id]
+
+    def get(self, session_id: str, model: str) -> Optional[List[int]]:
+        """Context for a session, or None if unknown, expired or for another model."""
+        self._evict_expired()
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        # Context tokens are only meaningful to the model that produced them
+        if entry["model"] != model:
+            self.discard(session_id)
+            return None
+        self._entries.move_to_end(session_id)
+        return entry["context"]
+
+    def put(self, session_id: str, model: str, context: List[int]):
+        self.discard(session_id)
+        if len(context) > self.max_tokens:
+            logger.warning(
+                f"Session {session_id} context ({len(context)} tokens) exceeds the cap, not stored"
+            )
+            return
+        self._entries[session_id] = {
+            "model": model,
+            "context": context,
+            "last_used": time.monotonic(),
+        }
+        self.total_tokens += len(context)
+        self._evict_over_capacity()
+
+    def discard(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry:
+            self.total_tokens -= len(entry["context"])
+
+    def _evict_expired(self):
+        cutoff = time.monotonic() - self.ttl
+        # Entries are in LRU order, so the expired ones are at the front
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            if entry["last_used"] >= cutoff:
+                break
+            self.discard(session_id)
+
+    def _evict_over_capacity(self):
+        self._evict_expired()
+        while self._entries and (
+            len(self._entries) > self.max_sessions
+            or self.total_tokens > self.max_tokens
+        ):
+            session_id = next(iter(self._entries))
+            logger.info(f"Evicting session {session_id} (capacity)")
+            self.discard(session_id)
+
+
+session_store = SessionStore(
+    ttl=settings.SESSION_TTL_SECONDS,
+    max_sessions=settings.SESSION_MAX_COUNT,
+    max_tokens=settings.SESSION_MAX_CONTEXT_TOKENS,
+)
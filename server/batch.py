@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from config import settings
+from laptop_client import get_laptop_generation
+from poster import post_link, post_to_external_api
+from telegram import send_telegram_message
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_COMMAND = "/batch"
+# Telegram rejects messages longer than 4096 characters
+TELEGRAM_MAX_LENGTH = 4096
+
+
+def parse_batch_command(text: str) -> Optional[List[str]]:
+    """
+    Returns the prompts of a `/batch` message (one per line), or None when the
+    text is not a batch command.
+    """
+    first_line, _, rest = text.strip().partition("\n")
+    command, _, inline_prompt = first_line.partition(" ")
+    # Group chats address commands as /batch@BotName
+    if command.split("@", 1)[0] != BATCH_COMMAND:
+        return None
+
+    lines = [inline_prompt] + rest.split("\n")
+    return [line.strip() for line in lines if line.strip()]
+
+
+async def _run_one(
+    index: int,
+    prompt: str,
+    generation_slots: asyncio.Semaphore,
+    posting_slots: asyncio.Semaphore,
+) -> dict:
+    result = {"index": index, "prompt": prompt, "ok": False}
+    try:
+        async with generation_slots:
+            content = await get_laptop_generation(prompt)
+        async with posting_slots:
+            post = await post_to_external_api(content)
+        result["ok"] = True
+        result["link"] = post_link(content, post)
+    except Exception as e:
+        logger.error(f"Batch item {index} failed: {str(e)}")
+        result["error"] = str(e)
+    return result
+
+
+def format_batch_summary(results: List[dict], duration: float) -> str:
+    succeeded = sum(1 for r in results if r["ok"])
+    lines = [
+        f"Batch complete: {succeeded}/{len(results)} posted in {duration:.1f}s",
+        "",
+    ]
+    for r in results:
+        label = r["prompt"] if len(r["prompt"]) <= 40 else r["prompt"][:37] + "..."
+        if r["ok"]:
+            lines.append(f"✅ {r['index']}. {label}\n{r['link']}")
+        else:
+            lines.append(f"❌ {r['index']}. {label}\n{r['error']}")
+
+    summary = "\n".join(lines)
+    if len(summary) > TELEGRAM_MAX_LENGTH:
+        summary = summary[: TELEGRAM_MAX_LENGTH - 3] + "..."
+    return summary
+
+
+async def process_batch(chat_id: int, prompts: List[str]):
+    """
+    Generates and posts every prompt concurrently, then replies once with an
+    aggregated summary. Generation and posting each have their own bound so a
+    slow blog API does not hold generation capacity and vice versa.
+
+    Runs as a background task, so errors (e.g. Telegram being unreachable) are
+    logged and reported to the chat instead of being raised.
+    """
+    try:
+        await _process_batch(chat_id, prompts)
+    except Exception as e:
+        logger.error(f"Error processing batch: {str(e)}")
+        try:
+            await send_telegram_message(
+                chat_id, f"Oops! Something went wrong with your batch: {str(e)}"
+            )
+        except Exception:
+            pass
+
+
+async def _process_batch(chat_id: int, prompts: List[str]):
+    if not prompts:
+        await send_telegram_message(
+            chat_id, "Usage: /batch followed by one prompt per line."
+        )
+        return
+    if len(prompts) > settings.BATCH_MAX_PROMPTS:
+        await send_telegram_message(
+            chat_id,
+            f"Batch too large: {len(prompts)} prompts (max {settings.BATCH_MAX_PROMPTS}).",
+        )
+        return
+
+    logger.info(f"Processing batch of {len(prompts)} prompts from chat_id {chat_id}")
+    await send_telegram_message(
+        chat_id, f"Batch accepted: generating {len(prompts)} posts..."
+    )
+
+    generation_slots = asyncio.Semaphore(settings.BATCH_GENERATION_CONCURRENCY)
+    posting_slots = asyncio.Semaphore(settings.BATCH_POST_CONCURRENCY)
+    start_time = time.time()
+    results = await asyncio.gather(
+        *(
+            _run_one(i, prompt, generation_slots, posting_slots)
+            for i, prompt in enumerate(prompts, start=1)
+        )
+    )
+    duration = time.time() - start_time
+
+    succeeded = sum(1 for r in results if r["ok"])
+    logger.info(
+        f"Batch for chat_id {chat_id} finished: {succeeded}/{len(results)} in {duration:.2f}s"
+    )
+    await send_telegram_message(chat_id, format_batch_summary(results, duration))
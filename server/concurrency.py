@@ -0,0 +1,211 @@
+import asyncio
+import collections
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+import httpx
+
+from config import settings
+from worker_link import WorkerJobError
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on in-flight generations, driven by observed latency.
+
+    Each completion reports its latency per generated token (or raw latency
+    when the token count is unknown). Latency is only comparable between
+    similar requests: short outputs carry a fixed prompt-eval cost and routes
+    may use different models. Samples are therefore grouped by the caller's
+    `key` (route/model) and a power-of-two output size bucket, and each group
+    has its own baseline: the lowest sample of the last `window_seconds`,
+    i.e. what such a request costs when the backend is not saturated.
+
+    While samples stay within `tolerance` of their baseline the limit grows by
+    about one per limit's worth of completions; a slower sample means requests
+    are queueing on the backend, and the limit is multiplied by `backoff`.
+    Decreases only react to requests started after the previous decrease, so
+    one congested window shrinks the limit once. Failures only count when
+    `is_congestion` says so; other errors (misconfiguration, bad requests)
+    say nothing about backend capacity.
+
+    A request that ran with nothing else in flight cannot have queued behind
+    our own traffic, so it resets its group's baseline. That is how the limit
+    recovers when the backend itself gets slower (e.g. a bigger model was
+    loaded): the limit drops to its minimum, the next solo request re-bases,
+    and growth resumes against the new cost. `tolerance * backoff` must stay
+    below 1 so decreases drop under the real capacity and regularly produce
+    such unqueued samples.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float,
+        min_limit: int,
+        max_limit: int,
+        tolerance: float = 1.5,
+        backoff: float = 0.6,
+        window_seconds: float = 600,
+        is_congestion: Callable[[Exception], bool] = lambda e: True,
+        history: int = 200,
+    ):
+        if tolerance * backoff >= 1:
+            raise ValueError("tolerance * backoff must be below 1")
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.window_seconds = window_seconds
+        self.is_congestion = is_congestion
+        self.in_flight = 0
+        self.history = collections.deque(maxlen=history)
+        # (key, size bucket) -> deque of (monotonic time, sample)
+        self._samples = {}
+        self._acquired = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+        self._record_history()
+
+    def _record_history(self):
+        self.history.append({"at": time.time(), "limit": round(self.limit, 2)})
+
+    @staticmethod
+    def _bucket(key: Optional[str], tokens: Optional[int]) -> tuple:
+        return (key, tokens.bit_length() if tokens else None)
+
+    def _baseline(self, bucket: tuple) -> Optional[float]:
+        samples = self._samples.get(bucket)
+        if not samples:
+            return None
+        cutoff = time.monotonic() - self.window_seconds
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        return min(s for _, s in samples) if samples else None
+
+    def baselines(self) -> dict:
+        result = {}
+        for bucket in list(self._samples):
+            baseline = self._baseline(bucket)
+            if baseline is None:
+                del self._samples[bucket]
+                continue
+            key, size = bucket
+            label = f"{key or 'default'}:{2 ** (size - 1) if size else '?'}+ tokens"
+            result[label] = baseline
+        return result
+
+    async def acquire(self) -> tuple:
+        async with self._condition:
+            while self.in_flight >= int(self.limit):
+                await self._condition.wait()
+            self.in_flight += 1
+            self._acquired += 1
+            # Solo if nothing else is in flight now and nothing starts later
+            solo_marker = self._acquired if self.in_flight == 1 else None
+        return time.monotonic(), solo_marker
+
+    async def release(
+        self,
+        ticket: tuple,
+        key: Optional[str] = None,
+        tokens: Optional[int] = None,
+        failed: bool = False,
+        observe: bool = True,
+    ):
+        started, solo_marker = ticket
+        elapsed = time.monotonic() - started
+        async with self._condition:
+            self.in_flight -= 1
+            solo = solo_marker is not None and solo_marker == self._acquired
+            if failed:
+                self._decrease(started)
+            elif observe:
+                sample = elapsed / tokens if tokens else elapsed
+                self._observe(self._bucket(key, tokens), sample, started, solo)
+            self._condition.notify_all()
+
+    def _observe(self, bucket: tuple, sample: float, started: float, solo: bool):
+        samples = self._samples.setdefault(bucket, collections.deque(maxlen=1000))
+        if solo:
+            # Unqueued by construction, so it is the current cost of a request
+            samples.clear()
+        samples.append((time.monotonic(), sample))
+        if sample > self._baseline(bucket) * self.tolerance:
+            self._decrease(started)
+        elif self.in_flight + 1 >= int(self.limit):
+            # Only grow when the current limit is actually being used
+            previous = int(self.limit)
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if int(self.limit) != previous:
+                self._record_history()
+
+    def _decrease(self, started: float):
+        if started < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self._record_history()
+
+    @asynccontextmanager
+    async def slot(self, key: Optional[str] = None):
+        """
+        Holds one generation slot. `key` groups comparable requests (e.g. the
+        route or model); the body may set `result["tokens"]` to the number of
+        generated tokens. Exceptions back off only if they signal congestion.
+        """
+        ticket = await self.acquire()
+        result = {"tokens": None}
+        try:
+            yield result
+        except Exception as e:
+            if self.is_congestion(e):
+                await self.release(ticket, failed=True)
+            else:
+                await self.release(ticket, observe=False)
+            raise
+        except BaseException:
+            # Cancellation says nothing about the backend, just free the slot
+            await self.release(ticket, observe=False)
+            raise
+        await self.release(ticket, key=key, tokens=result["tokens"])
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "baselines": self.baselines(),
+            "tolerance": self.tolerance,
+            "history": list(self.history),
+        }
+
+
+def is_backend_congestion(error: Exception) -> bool:
+    """
+    Whether a failed generation points at an overloaded backend: timeouts,
+    connection problems and server errors. Missing configuration, an absent
+    laptop or a rejected request do not.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(
+        error,
+        (
+            httpx.TransportError,
+            asyncio.TimeoutError,
+            ConnectionError,
+            WorkerJobError,
+        ),
+    )
+
+
+generation_limiter = AdaptiveLimiter(
+    initial_limit=settings.ADAPTIVE_INITIAL_LIMIT,
+    min_limit=settings.ADAPTIVE_MIN_LIMIT,
+    max_limit=settings.ADAPTIVE_MAX_LIMIT,
+    tolerance=settings.ADAPTIVE_LATENCY_TOLERANCE,
+    backoff=settings.ADAPTIVE_BACKOFF,
+    window_seconds=settings.ADAPTIVE_BASELINE_WINDOW_SECONDS,
+    is_congestion=is_backend_congestion,
+)
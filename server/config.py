@@ -1,15 +1,77 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
     TELEGRAM_BOT_TOKEN: str
-    LAPTOP_API_URL: str
+    # Required for the "http" transport, optional fallback for "auto"
+    LAPTOP_API_URL: Optional[str] = None
     LAPTOP_SHARED_SECRET: str
     EXTERNAL_API_URL: str
     EXTERNAL_API_KEY: str
     DEFAULT_CHAT_ID: str = None
 
+    # How generations reach the laptop: "http" posts to LAPTOP_API_URL, "link"
+    # uses laptops connected to /workers/connect, "auto" prefers the link and
+    # falls back to HTTP when no laptop is connected
+    LAPTOP_TRANSPORT: Literal["http", "link", "auto"] = "http"
+    LINK_HEARTBEAT_SECONDS: float = 15
+    # Over the link, stream single-prompt generations into a Telegram message
+    # edited at most once per LIVE_PREVIEW_INTERVAL_SECONDS
+    LIVE_PREVIEW_ENABLED: bool = True
+    LIVE_PREVIEW_INTERVAL_SECONDS: float = 2
+
+    # Adaptive (AIMD) limit on concurrent generations sent to the laptop.
+    # ADAPTIVE_LATENCY_TOLERANCE * ADAPTIVE_BACKOFF must be below 1.
+    ADAPTIVE_CONCURRENCY_ENABLED: bool = True
+    ADAPTIVE_INITIAL_LIMIT: int = 2
+    ADAPTIVE_MIN_LIMIT: int = 1
+    ADAPTIVE_MAX_LIMIT: int = 32
+    ADAPTIVE_LATENCY_TOLERANCE: float = 1.5
+    ADAPTIVE_BACKOFF: float = 0.6
+    # How long the fastest latency seen stays the baseline for similar requests
+    ADAPTIVE_BASELINE_WINDOW_SECONDS: float = 600
+
+    # Public post URL used in replies, e.g. https://example.com/blog/{slug}
+    POST_URL_TEMPLATE: Optional[str] = None
+
+    # Size-aware model routing. Prompts up to ROUTING_SHORT_PROMPT_CHARS with
+    # no long-form cue (keyword or a word count >= ROUTING_LONG_FORM_WORDS) use
+    # the small model; unset models fall back to the laptop's OLLAMA_MODEL.
+    ROUTING_ENABLED: bool = False
+    ROUTING_SMALL_MODEL: Optional[str] = None
+    ROUTING_LARGE_MODEL: Optional[str] = None
+    ROUTING_SHORT_PROMPT_CHARS: int = 200
+    ROUTING_LONG_FORM_WORDS: int = 500
+    ROUTING_LONG_FORM_KEYWORDS: str = "article,blog,essay,post,detailed,in-depth,guide,tutorial"
+    ROUTING_SMALL_NUM_PREDICT: int = 512
+    ROUTING_LARGE_NUM_PREDICT: int = 4096
+
+    # Idle timeout of /session conversations, keep in line with the laptop's
+    SESSION_TTL_SECONDS: float = 1800
+
+    # /batch command limits
+    BATCH_MAX_PROMPTS: int = 20
+    BATCH_GENERATION_CONCURRENCY: int = 4
+    BATCH_POST_CONCURRENCY: int = 2
+
+    # Runtime diagnostics (/debug/* endpoints), off unless explicitly enabled.
+    # The endpoints require an X-SECRET header matching DIAGNOSTICS_SECRET.
+    DIAGNOSTICS_ENABLED: bool = False
+    DIAGNOSTICS_SECRET: Optional[str] = None
+    LOOP_LAG_THRESHOLD_MS: float = 250
+    LOOP_LAG_INTERVAL_MS: float = 100
+    SLOW_REQUEST_MS: float = 5000
+    PROFILE_MAX_SECONDS: float = 30
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
+    @model_validator(mode="after")
+    def check_laptop_api_url(self):
+        if self.LAPTOP_TRANSPORT == "http" and not self.LAPTOP_API_URL:
+            raise ValueError('LAPTOP_API_URL is required when LAPTOP_TRANSPORT is "http"')
+        return self
+
 
 settings = Settings()
@@ -0,0 +1,216 @@
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+
+logger = logging.getLogger(__name__)
+
+# Each sample walks every thread's stack, so keep the rate bounded
+MIN_PROFILE_INTERVAL_MS = 10
+
+
+class LoopLagMonitor:
+    """
+    Detects event-loop stalls.
+
+    A coroutine on the loop records a heartbeat every `interval` seconds while a
+    watchdog thread checks how stale that heartbeat is. When it is older than
+    `threshold`, the watchdog grabs the loop thread's current stack, which is
+    the code that is blocking the loop.
+    """
+
+    def __init__(self, threshold_ms: float, interval_ms: float, history: int = 50):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.stalls = collections.deque(maxlen=history)
+        self._last_beat = time.monotonic()
+        self._loop_thread_id = None
+        self._stop = threading.Event()
+        self._task = None
+        self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watchdog(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            # The heartbeat is expected to be `interval` old; anything past that is lag
+            lag = time.monotonic() - beat - self.interval
+            if lag < self.threshold:
+                continue
+            if beat == reported_beat:
+                # Same stall still in progress, keep its duration current
+                self.stalls[-1]["lag_ms"] = round(lag * 1000, 2)
+                continue
+            # Report each stall once, with the stack captured while it is blocked
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            self.stalls.append(
+                {
+                    "detected_at": time.time(),
+                    "lag_ms": round(lag * 1000, 2),
+                    "stack": stack,
+                }
+            )
+            logger.warning(
+                f"Event loop blocked for {lag * 1000:.2f}ms. Blocking stack:\n{stack}"
+            )
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(
+            target=self._watchdog, name="loop-lag-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class SlowRequestRecorder:
+    """Keeps per-route timing stats and the most recent slow requests."""
+
+    def __init__(self, threshold_ms: float, history: int = 100):
+        self.threshold_ms = threshold_ms
+        self.recent = collections.deque(maxlen=history)
+        self.routes = {}
+
+    def record(self, method: str, route: str, status_code: int, duration_ms: float):
+        key = f"{method} {route}"
+        stats = self.routes.setdefault(
+            key, {"count": 0, "slow": 0, "total_ms": 0.0, "max_ms": 0.0}
+        )
+        stats["count"] += 1
+        stats["total_ms"] += duration_ms
+        stats["max_ms"] = max(stats["max_ms"], duration_ms)
+        if duration_ms >= self.threshold_ms:
+            stats["slow"] += 1
+            self.recent.append(
+                {
+                    "at": time.time(),
+                    "route": key,
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 2),
+                }
+            )
+
+    def snapshot(self) -> dict:
+        routes = {
+            key: {
+                "count": s["count"],
+                "slow": s["slow"],
+                "avg_ms": round(s["total_ms"] / s["count"], 2),
+                "max_ms": round(s["max_ms"], 2),
+            }
+            for key, s in self.routes.items()
+        }
+        return {
+            "threshold_ms": self.threshold_ms,
+            "routes": routes,
+            "recent": list(self.recent),
+        }
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"
+
+
+def sample_stacks(seconds: float, interval: float) -> str:
+    """
+    Samples every thread's stack for `seconds` and returns them in collapsed
+    "frame;frame;frame count" format, as consumed by flamegraph.pl/speedscope.
+    """
+    own_id = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    counts = collections.Counter()
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+
+    return "\n".join(f"{stack} {count}" for stack, count in counts.items())
+
+
+def install(
+    app,
+    monitor: LoopLagMonitor,
+    recorder: SlowRequestRecorder,
+    dependencies: list,
+    max_profile_seconds: float,
+):
+    """Adds the slow-request middleware and the /debug routes to `app`."""
+
+    @app.middleware("http")
+    async def record_slow_requests(request: Request, call_next):
+        start_time = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            # Unmatched paths share one bucket so scanners can't grow the table
+            path = route.path if route else "<unmatched>"
+            duration_ms = (time.perf_counter() - start_time) * 1000
+            recorder.record(request.method, path, status_code, duration_ms)
+
+    router = APIRouter(prefix="/debug", dependencies=dependencies)
+    profile_lock = asyncio.Lock()
+
+    @router.get("/profile", response_class=PlainTextResponse)
+    async def profile(
+        seconds: float = Query(5, gt=0),
+        interval_ms: float = Query(MIN_PROFILE_INTERVAL_MS, ge=MIN_PROFILE_INTERVAL_MS),
+    ):
+        # Only one profile at a time, concurrent ones would multiply the overhead
+        if profile_lock.locked():
+            raise HTTPException(status_code=409, detail="A profile is already running")
+        async with profile_lock:
+            seconds = min(seconds, max_profile_seconds)
+            # Sample from a worker thread so the loop keeps serving while profiled
+            return await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+
+    @router.get("/loop-lag")
+    async def loop_lag():
+        return {
+            "threshold_ms": monitor.threshold * 1000,
+            "stalls": list(monitor.stalls),
+        }
+
+    @router.get("/slow-requests")
+    async def slow_requests():
+        return recorder.snapshot()
+
+    app.include_router(router)
@@ -1,18 +1,114 @@
 import httpx
+import logging
+import time
+from typing import Awaitable, Callable, Optional
 from config import settings
-from models import LaptopResponse
+from models import LaptopRequest, LaptopResponse
+from routing import choose_route, model_stats
+from worker_link import WorkerUnavailable, worker_hub
+from concurrency import generation_limiter
 
 
-async def get_laptop_generation(prompt: str) -> str:
-    headers = {"X-SECRET": settings.LAPTOP_SHARED_SECRET}
-    payload = {"prompt": prompt}
+logger = logging.getLogger(__name__)
+
 
+async def _post_generation(payload: dict) -> dict:
+    if not settings.LAPTOP_API_URL:
+        # Only reachable in "auto" mode, the config requires the URL for "http"
+        raise WorkerUnavailable(
+            "No laptop connected over the reverse link and no LAPTOP_API_URL to fall back to"
+        )
+    headers = {"X-SECRET": settings.LAPTOP_SHARED_SECRET}
     async with httpx.AsyncClient(timeout=None) as client:
         response = await client.post(
             settings.LAPTOP_API_URL, json=payload, headers=headers
         )
         response.raise_for_status()
-        data = response.json()
-        # Assuming the response matches our LaptopResponse model
-        laptop_res = LaptopResponse(**data)
-        return laptop_res.generated_content
+        return response.json()
+
+
+def choose_transport() -> str:
+    """
+    "link" when the next generation goes over the reverse link (and can
+    stream), otherwise "http". In "auto" mode this depends on whether a laptop
+    is connected right now.
+    """
+    transport = settings.LAPTOP_TRANSPORT
+    if transport == "link" or (transport == "auto" and worker_hub.available()):
+        return "link"
+    return "http"
+
+
+async def _send_generation(
+    payload: dict, transport: Optional[str] = None, on_chunk=None
+) -> dict:
+    """
+    Delivers a generation request over `transport`, chosen now if not given.
+    Only the reverse link streams, so on_chunk is not called over HTTP.
+    """
+    if (transport or choose_transport()) == "link":
+        return await worker_hub.generate(payload, on_chunk=on_chunk)
+    return await _post_generation(payload)
+
+
+async def _limited_generation(
+    payload: dict, key: str, transport: Optional[str] = None, on_chunk=None
+) -> dict:
+    """
+    Sends a request once the adaptive limiter has a free slot for it. `key`
+    groups requests with comparable latency (same route/model).
+    """
+    if not settings.ADAPTIVE_CONCURRENCY_ENABLED:
+        return await _send_generation(payload, transport, on_chunk)
+    async with generation_limiter.slot(key) as slot:
+        data = await _send_generation(payload, transport, on_chunk)
+        slot["tokens"] = data.get("eval_count")
+        return data
+
+
+async def get_laptop_generation(
+    prompt: str,
+    session: Optional[dict] = None,
+    transport: Optional[str] = None,
+    on_chunk: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> str:
+    """
+    Generates a reply on the laptop. Pass `transport` (from choose_transport)
+    when the caller already decided based on it, e.g. to stream; otherwise it
+    is chosen once a concurrency slot is free.
+    """
+    if session is not None and session["route"] is not None:
+        # Follow-ups stay on the session's model so its stored context is reused
+        route = session["route"]
+    else:
+        route = choose_route(prompt)
+        if session is not None:
+            session["route"] = route
+    request = LaptopRequest(
+        prompt=prompt,
+        model=route.get("model"),
+        num_predict=route.get("num_predict"),
+        session_id=session["id"] if session else None,
+    )
+    payload = request.model_dump(exclude_none=True)
+    # Requests without an explicit model are tracked under their routing tier.
+    # Successes and failures must share the key so /stats/models is comparable.
+    stats_key = route.get("model") or route["tier"]
+    logger.info(f"Routing prompt to {route['tier']} tier ({stats_key})")
+
+    start = time.time()
+    try:
+        data = await _limited_generation(payload, stats_key, transport, on_chunk)
+    except Exception:
+        model_stats.record(stats_key, time.time() - start, failed=True)
+        raise
+
+    # Assuming the response matches our LaptopResponse model
+    laptop_res = LaptopResponse(**data)
+    model_stats.record(
+        stats_key,
+        time.time() - start,
+        eval_count=laptop_res.eval_count,
+        eval_seconds=laptop_res.eval_seconds,
+    )
+    return laptop_res.generated_content
@@ -1,12 +1,18 @@
 import asyncio
 import httpx
-from fastapi import FastAPI, HTTPException, Request
-from models import TelegramUpdate
-from laptop_client import get_laptop_generation
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, WebSocket
+from models import BatchRequest, TelegramUpdate
+from batch import parse_batch_command, process_batch
+from laptop_client import choose_transport, get_laptop_generation
+from routing import model_stats
+from sessions import chat_sessions, handle_session_command
+from worker_link import worker_hub
+from concurrency import generation_limiter
 from poster import post_to_external_api
-from telegram import send_telegram_message
+from telegram import LivePreview, send_telegram_message
 from config import settings
 from contextlib import asynccontextmanager
+import diagnostics
 import logging
 import time
 
@@ -18,11 +24,47 @@ logger = logging.getLogger(__name__)
 
 async def process_telegram_message(chat_id: int, prompt: str):
     """Core logic to handle a received message."""
-    logger.info(f"Processing prompt from chat_id {chat_id}: {prompt}")
+    batch_prompts = parse_batch_command(prompt)
+    if batch_prompts is not None:
+        await process_batch(chat_id, batch_prompts)
+        return
+
     try:
-        # 1. Forward to laptop service
-        generated_content = await get_laptop_generation(prompt)
+        session_reply = handle_session_command(chat_id, prompt)
+        if session_reply is not None:
+            await send_telegram_message(chat_id, session_reply)
+            return
+
+        logger.info(f"Processing prompt from chat_id {chat_id}: {prompt}")
+
+        # Over the reverse link the generation streams into a live message.
+        # The transport is picked once, so the preview and the generation
+        # agree even if a laptop connects or leaves in between.
+        transport = choose_transport()
+        preview = None
+        if settings.LIVE_PREVIEW_ENABLED and transport == "link":
+            sent = await send_telegram_message(chat_id, "✍️ Generating...")
+            preview = LivePreview(
+                chat_id,
+                sent["result"]["message_id"],
+                settings.LIVE_PREVIEW_INTERVAL_SECONDS,
+            )
+
+        # 1. Forward to laptop service, continuing the chat's session if any
+        try:
+            generated_content = await get_laptop_generation(
+                prompt,
+                session=chat_sessions.get(chat_id),
+                transport=transport,
+                on_chunk=preview.on_chunk if preview else None,
+            )
+        except Exception:
+            if preview:
+                await preview.finish(failed=True)
+            raise
         logger.info(f"Received generation from laptop service")
+        if preview:
+            await preview.finish()
 
         # 2. Post to external API
         await post_to_external_api(generated_content)
@@ -77,6 +119,11 @@ async def telegram_polling_worker():
             await asyncio.sleep(1)
 
 
+lag_monitor = diagnostics.LoopLagMonitor(
+    settings.LOOP_LAG_THRESHOLD_MS, settings.LOOP_LAG_INTERVAL_MS
+)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Send notification if chat id is configured
@@ -95,6 +142,10 @@ async def lifespan(app: FastAPI):
     else:
         logger.info("Startup notification skipped (no chat ID configured)")
 
+    if settings.DIAGNOSTICS_ENABLED:
+        lag_monitor.start()
+        logger.info("Diagnostics enabled: loop lag monitor started")
+
     # Start background polling worker
     polling_task = asyncio.create_task(telegram_polling_worker())
 
@@ -107,6 +158,9 @@ async def lifespan(app: FastAPI):
     except asyncio.CancelledError:
         pass
 
+    if settings.DIAGNOSTICS_ENABLED:
+        await lag_monitor.stop()
+
 
 app = FastAPI(title="Telegram-LLM-Poster Gateway", lifespan=lifespan)
 
@@ -139,6 +193,23 @@ async def log_requests(request: Request, call_next):
         raise
 
 
+async def verify_diagnostics_secret(x_secret: str = Header(...)):
+    if not settings.DIAGNOSTICS_SECRET or x_secret != settings.DIAGNOSTICS_SECRET:
+        logger.warning("Unauthorized diagnostics access attempt")
+        raise HTTPException(status_code=403, detail="Invalid diagnostics secret")
+    return x_secret
+
+
+if settings.DIAGNOSTICS_ENABLED:
+    diagnostics.install(
+        app,
+        lag_monitor,
+        diagnostics.SlowRequestRecorder(settings.SLOW_REQUEST_MS),
+        dependencies=[Depends(verify_diagnostics_secret)],
+        max_profile_seconds=settings.PROFILE_MAX_SECONDS,
+    )
+
+
 @app.post("/telegram/webhook")
 async def telegram_webhook(update: TelegramUpdate):
     """Keep webhook support but it's redundant now with polling."""
@@ -153,6 +224,59 @@ async def telegram_webhook(update: TelegramUpdate):
     return {"status": "accepted"}
 
 
+async def verify_gateway_secret(x_secret: str = Header(...)):
+    if x_secret != settings.LAPTOP_SHARED_SECRET:
+        logger.warning("Unauthorized batch request attempt")
+        raise HTTPException(status_code=403, detail="Invalid secret")
+    return x_secret
+
+
+@app.post("/telegram/batch", dependencies=[Depends(verify_gateway_secret)])
+async def telegram_batch(request: BatchRequest):
+    """
+    Same as the /batch command, with the prompts given as a JSON list. It
+    publishes posts and messages any chat, so it requires the X-SECRET header
+    (LAPTOP_SHARED_SECRET).
+    """
+    prompts = [p.strip() for p in request.prompts if p.strip()]
+    if len(prompts) > settings.BATCH_MAX_PROMPTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(prompts)} prompts (max {settings.BATCH_MAX_PROMPTS})",
+        )
+    asyncio.create_task(process_batch(request.chat_id, prompts))
+    return {"status": "accepted", "prompts": len(prompts)}
+
+
+@app.websocket("/workers/connect")
+async def workers_connect(websocket: WebSocket):
+    """Reverse link: laptops dial in here and receive generation jobs."""
+    await worker_hub.serve(websocket)
+
+
+@app.get("/workers")
+async def list_workers():
+    return {"transport": settings.LAPTOP_TRANSPORT, "workers": worker_hub.snapshot()}
+
+
+@app.get("/stats/models")
+async def model_stats_endpoint():
+    """Per-model latency and tokens/sec, for tuning the routing thresholds."""
+    return {
+        "routing_enabled": settings.ROUTING_ENABLED,
+        "models": model_stats.snapshot(),
+    }
+
+
+@app.get("/stats/concurrency")
+async def concurrency_stats():
+    """Current adaptive generation limit and how it has changed over time."""
+    return {
+        "enabled": settings.ADAPTIVE_CONCURRENCY_ENABLED,
+        **generation_limiter.snapshot(),
+    }
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
@@ -11,12 +11,25 @@ class TelegramUpdate(BaseModel):
     update_id: int
     message: Optional[TelegramMessage] = None
 
+class BatchRequest(BaseModel):
+    chat_id: int
+    prompts: List[str]
+
 # Laptop Service Models
 class LaptopRequest(BaseModel):
     prompt: str
+    model: Optional[str] = None
+    num_predict: Optional[int] = None
+    num_ctx: Optional[int] = None
+    temperature: Optional[float] = None
+    session_id: Optional[str] = None
 
 class LaptopResponse(BaseModel):
     generated_content: str
+    model: Optional[str] = None
+    prompt_eval_count: Optional[int] = None
+    eval_count: Optional[int] = None
+    eval_seconds: Optional[float] = None
 
 # External API Models
 class ExternalPostRequest(BaseModel):
@@ -29,6 +29,22 @@ def generate_slug(title: str) -> str:
     return slug.strip("-")
 
 
+def extract_title(content: str) -> str:
+    """Title of a post: the first line of the content, without heading marks."""
+    lines = content.strip().split("\n")
+    return lines[0].strip("#").strip() if lines else "Generated Blog Post"
+
+
+def post_link(content: str, post: dict) -> str:
+    """Best available link to a published post, falling back to its title."""
+    if isinstance(post, dict) and post.get("url"):
+        return post["url"]
+    title = extract_title(content)
+    if settings.POST_URL_TEMPLATE:
+        return settings.POST_URL_TEMPLATE.format(slug=generate_slug(title))
+    return title
+
+
 async def post_to_external_api(content: str):
     """Post blog content to the external API after authenticating."""
 
@@ -36,8 +52,7 @@ async def post_to_external_api(content: str):
     jwt_token = await get_jwt_token()
 
     # Step 2: Extract title from content (first line or first heading)
-    lines = content.strip().split("\n")
-    title = lines[0].strip("#").strip() if lines else "Generated Blog Post"
+    title = extract_title(content)
 
     # Generate excerpt (first 150 characters of content)
     excerpt = content[:150] + "..." if len(content) > 150 else content
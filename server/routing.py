@@ -0,0 +1,110 @@
+import re
+import time
+from typing import Optional
+
+from config import settings
+
+
+# Matches explicit length requests such as "3000-word article" or "800 words"
+WORD_COUNT_PATTERN = re.compile(r"(\d{3,5})[\s-]*words?\b", re.IGNORECASE)
+
+
+def is_long_form(prompt: str) -> bool:
+    """Whether a prompt asks for long-form output that needs the large model."""
+    match = WORD_COUNT_PATTERN.search(prompt)
+    if match and int(match.group(1)) >= settings.ROUTING_LONG_FORM_WORDS:
+        return True
+    lowered = prompt.lower()
+    keywords = [k.strip() for k in settings.ROUTING_LONG_FORM_KEYWORDS.split(",")]
+    return any(k and re.search(rf"\b{re.escape(k)}\b", lowered) for k in keywords)
+
+
+def choose_route(prompt: str) -> dict:
+    """
+    Picks the model and generation limits for a prompt.
+
+    Short prompts with no long-form cues go to ROUTING_SMALL_MODEL with a tight
+    output budget, everything else to ROUTING_LARGE_MODEL. A model left unset
+    is omitted so the on-device service falls back to its OLLAMA_MODEL.
+    """
+    if not settings.ROUTING_ENABLED:
+        return {"tier": "default"}
+
+    if len(prompt) <= settings.ROUTING_SHORT_PROMPT_CHARS and not is_long_form(prompt):
+        tier, model, num_predict = (
+            "small",
+            settings.ROUTING_SMALL_MODEL,
+            settings.ROUTING_SMALL_NUM_PREDICT,
+        )
+    else:
+        tier, model, num_predict = (
+            "large",
+            settings.ROUTING_LARGE_MODEL,
+            settings.ROUTING_LARGE_NUM_PREDICT,
+        )
+
+    route = {"tier": tier, "num_predict": num_predict}
+    if model:
+        route["model"] = model
+    return route
+
+
+class ModelStats:
+    """Per-model latency and throughput, used to tune the routing thresholds."""
+
+    def __init__(self):
+        self.models = {}
+
+    def record(
+        self,
+        model: str,
+        latency: float,
+        eval_count: Optional[int] = None,
+        eval_seconds: Optional[float] = None,
+        failed: bool = False,
+    ):
+        stats = self.models.setdefault(
+            model,
+            {
+                "requests": 0,
+                "failures": 0,
+                "total_latency": 0.0,
+                "max_latency": 0.0,
+                "tokens": 0,
+                "eval_seconds": 0.0,
+                "last_at": None,
+            },
+        )
+        stats["requests"] += 1
+        stats["last_at"] = time.time()
+        if failed:
+            stats["failures"] += 1
+            return
+        stats["total_latency"] += latency
+        stats["max_latency"] = max(stats["max_latency"], latency)
+        if eval_count and eval_seconds:
+            stats["tokens"] += eval_count
+            stats["eval_seconds"] += eval_seconds
+
+    def snapshot(self) -> dict:
+        result = {}
+        for model, s in self.models.items():
+            succeeded = s["requests"] - s["failures"]
+            result[model] = {
+                "requests": s["requests"],
+                "failures": s["failures"],
+                "avg_latency_s": (
+                    round(s["total_latency"] / succeeded, 3) if succeeded else None
+                ),
+                "max_latency_s": round(s["max_latency"], 3),
+                "tokens_per_second": (
+                    round(s["tokens"] / s["eval_seconds"], 2)
+                    if s["eval_seconds"]
+                    else None
+                ),
+                "last_at": s["last_at"],
+            }
+        return result
+
+
+model_stats = ModelStats()
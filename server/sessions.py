@@ -0,0 +1,65 @@
+import time
+import uuid
+from typing import Optional
+
+from config import settings
+
+
+SESSION_COMMAND = "/session"
+END_SESSION_COMMAND = "/endsession"
+
+
+class ChatSessions:
+    """
+    Tracks the active conversation session of each chat.
+
+    A session pins the route (model and limits) chosen for its first prompt,
+    since the laptop's stored context only works with the model that built it.
+    Idle sessions expire after `ttl` seconds, matching the laptop-side TTL.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._sessions = {}
+
+    def start(self, chat_id: int) -> dict:
+        session = {"id": uuid.uuid4().hex, "route": None, "last_used": time.time()}
+        self._sessions[chat_id] = session
+        return session
+
+    def end(self, chat_id: int) -> bool:
+        return self._sessions.pop(chat_id, None) is not None
+
+    def get(self, chat_id: int) -> Optional[dict]:
+        session = self._sessions.get(chat_id)
+        if session is None:
+            return None
+        if time.time() - session["last_used"] > self.ttl:
+            del self._sessions[chat_id]
+            return None
+        session["last_used"] = time.time()
+        return session
+
+
+chat_sessions = ChatSessions(ttl=settings.SESSION_TTL_SECONDS)
+
+
+def handle_session_command(chat_id: int, text: str) -> Optional[str]:
+    """
+    Handles /session and /endsession. Returns the reply to send, or None when
+    the text is not a session command.
+    """
+    words = text.split(maxsplit=1)
+    # Group chats address commands as /command@BotName
+    command = words[0].split("@", 1)[0] if words else ""
+    if command == SESSION_COMMAND:
+        chat_sessions.start(chat_id)
+        return (
+            "Session started. Follow-up messages now continue from the previous "
+            "generation. Send /endsession to stop."
+        )
+    if command == END_SESSION_COMMAND:
+        if chat_sessions.end(chat_id):
+            return "Session ended. Messages are handled independently again."
+        return "No active session."
+    return None
@@ -1,7 +1,13 @@
+import asyncio
 import httpx
+import logging
+import time
 from config import settings
 
 
+logger = logging.getLogger(__name__)
+
+
 async def send_telegram_message(chat_id: int, text: str):
     url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {"chat_id": chat_id, "text": text}
@@ -10,3 +16,66 @@ async def send_telegram_message(chat_id: int, text: str):
         response = await client.post(url, json=payload)
         response.raise_for_status()
         return response.json()
+
+
+async def edit_telegram_message(chat_id: int, message_id: int, text: str):
+    url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/editMessageText"
+    payload = {"chat_id": chat_id, "message_id": message_id, "text": text}
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await client.post(url, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+
+class LivePreview:
+    """
+    Shows a generation as it streams in by editing one Telegram message.
+
+    `on_chunk` only buffers text and schedules an edit, so it never blocks the
+    caller (the reverse link's receive loop). Edits are throttled to one per
+    `interval` seconds to stay within Telegram's rate limits, and only the
+    tail of the text is shown once it outgrows a single message.
+    """
+
+    MAX_LENGTH = 4096
+
+    def __init__(self, chat_id: int, message_id: int, interval: float):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.interval = interval
+        self.text = ""
+        self._shown = ""
+        self._last_edit = 0.0
+        self._task = None
+
+    async def on_chunk(self, text: str):
+        self.text += text
+        due = time.monotonic() - self._last_edit >= self.interval
+        if due and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._edit())
+
+    async def _edit(self):
+        self._last_edit = time.monotonic()
+        text = self.text
+        if len(text) > self.MAX_LENGTH:
+            text = "..." + text[-(self.MAX_LENGTH - 3) :]
+        if not text.strip() or text == self._shown:
+            return
+        try:
+            await edit_telegram_message(self.chat_id, self.message_id, text)
+            self._shown = text
+        except Exception as e:
+            logger.warning(f"Could not update live preview: {e}")
+
+    async def finish(self, failed: bool = False):
+        """
+        Waits for a pending edit, then shows the complete text. A failed
+        generation keeps what was streamed so far and is marked as failed, so
+        the placeholder never stays at "Generating...".
+        """
+        if self._task is not None:
+            await self._task
+        if failed:
+            self.text = (self.text + "\n\n" if self.text.strip() else "") + "❌ Generation failed."
+        await self._edit()
@@ -0,0 +1,174 @@
+import asyncio
+import collections
+import random
+import statistics
+import time
+
+import httpx
+
+from concurrency import AdaptiveLimiter, is_backend_congestion
+from worker_link import WorkerUnavailable
+
+
+class FakeBackend:
+    """
+    Generation backend with `capacity` parallel slots and a FIFO queue in
+    front of them, like Ollama. Requests beyond capacity wait, so latency
+    grows while throughput stays flat: the throughput-optimal concurrency is
+    exactly `capacity`.
+
+    A request costs `overhead` (prompt eval) plus `per_token` per generated
+    token, all multiplied by `slowdown` (e.g. a bigger model was loaded).
+    """
+
+    def __init__(self, capacity: int, overhead: float, per_token: float):
+        self.capacity = capacity
+        self.overhead = overhead
+        self.per_token = per_token
+        self.slowdown = 1.0
+        self.active = 0
+        self.completed = 0
+        self._queue = collections.deque()
+
+    def _admit(self):
+        while self._queue and self.active < self.capacity:
+            waiter = self._queue.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+    def set_capacity(self, capacity: int):
+        self.capacity = capacity
+        self._admit()
+
+    async def generate(self, tokens: int) -> int:
+        waiter = asyncio.get_running_loop().create_future()
+        self._queue.append(waiter)
+        self._admit()
+        await waiter
+        try:
+            await asyncio.sleep((self.overhead + tokens * self.per_token) * self.slowdown)
+        finally:
+            self.active -= 1
+            self._admit()
+        self.completed += 1
+        return tokens
+
+
+async def simulate(
+    phases, sizes=(100,), overhead=0.0, per_token=0.0002, clients=40
+):
+    """
+    Drives the limiter with more clients than any capacity. Each phase is
+    (capacity, slowdown, seconds); requests pick their output size from
+    `sizes`. Returns, per phase, the capacity, the average limit over the
+    phase's second half and the backend throughput in requests per second.
+    """
+    backend = FakeBackend(phases[0][0], overhead, per_token)
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=64)
+    rng = random.Random(1)
+    stop = asyncio.Event()
+
+    async def client():
+        while not stop.is_set():
+            async with limiter.slot("model") as slot:
+                slot["tokens"] = await backend.generate(rng.choice(sizes))
+
+    tasks = [asyncio.create_task(client()) for _ in range(clients)]
+    results = []
+    for capacity, slowdown, seconds in phases:
+        backend.set_capacity(capacity)
+        backend.slowdown = slowdown
+        completed_before = backend.completed
+        samples = []
+        start = time.monotonic()
+        while time.monotonic() - start < seconds:
+            await asyncio.sleep(0.01)
+            if time.monotonic() - start > seconds / 2:
+                samples.append(limiter.limit)
+        throughput = (backend.completed - completed_before) / seconds
+        results.append((capacity, statistics.mean(samples), throughput))
+
+    stop.set()
+    await asyncio.gather(*tasks)
+    return results, limiter
+
+
+def test_limit_tracks_changing_capacity():
+    phases = [(8, 1, 3), (2, 1, 3), (5, 1, 3)]
+    results, limiter = asyncio.run(simulate(phases))
+
+    for capacity, avg_limit, throughput in results:
+        # AIMD oscillates between roughly backoff*tolerance and tolerance times
+        # the optimum, so the average settles near (slightly above) capacity
+        assert capacity * 0.8 <= avg_limit <= capacity * 1.6, (capacity, avg_limit)
+        # and keeps the backend close to its maximum throughput (0.02s each)
+        assert throughput >= 0.7 * capacity / 0.02, (capacity, throughput)
+
+    assert len(limiter.history) > len(phases)
+
+
+def test_mixed_output_sizes():
+    # Short outputs cost far more per token than long ones; comparing them
+    # against one shared baseline would read as constant congestion
+    results, _ = asyncio.run(
+        simulate([(8, 1, 4)], sizes=(20, 2000), overhead=0.01, per_token=0.00002)
+    )
+    capacity, avg_limit, _ = results[0]
+    assert capacity * 0.8 <= avg_limit <= capacity * 1.6, avg_limit
+
+
+def test_recovers_when_backend_slows_down():
+    # Same capacity, but every request suddenly takes three times as long
+    results, _ = asyncio.run(simulate([(8, 1, 3), (8, 3, 4)]))
+    capacity, avg_limit, _ = results[1]
+    assert capacity * 0.8 <= avg_limit <= capacity * 1.6, avg_limit
+
+
+def test_only_congestion_failures_back_off():
+    async def fail_with(error):
+        limiter = AdaptiveLimiter(
+            initial_limit=10,
+            min_limit=1,
+            max_limit=64,
+            is_congestion=is_backend_congestion,
+        )
+        try:
+            async with limiter.slot():
+                raise error
+        except Exception:
+            pass
+        assert limiter.in_flight == 0
+        return limiter.limit
+
+    request = httpx.Request("POST", "http://laptop/generate")
+
+    def status_error(code):
+        response = httpx.Response(code, request=request)
+        return httpx.HTTPStatusError("error", request=request, response=response)
+
+    assert asyncio.run(fail_with(httpx.ReadTimeout("slow", request=request))) == 6
+    assert asyncio.run(fail_with(status_error(503))) == 6
+    assert asyncio.run(fail_with(ConnectionError("link dropped"))) == 6
+    assert asyncio.run(fail_with(status_error(403))) == 10
+    assert asyncio.run(fail_with(WorkerUnavailable("no laptop"))) == 10
+    assert asyncio.run(fail_with(ValueError("bad response"))) == 10
+
+
+if __name__ == "__main__":
+    scenarios = [
+        ("changing capacity", [(8, 1, 3), (2, 1, 3), (5, 1, 3)], {}),
+        (
+            "mixed sizes",
+            [(8, 1, 4)],
+            {"sizes": (20, 2000), "overhead": 0.01, "per_token": 0.00002},
+        ),
+        ("backend slows 3x", [(8, 1, 3), (8, 3, 4)], {}),
+    ]
+    for name, phases, options in scenarios:
+        results, limiter = asyncio.run(simulate(phases, **options))
+        print(f"--- {name}")
+        print("capacity  avg limit  requests/s")
+        for capacity, avg_limit, throughput in results:
+            print(f"{capacity:8d}  {avg_limit:9.2f}  {throughput:10.1f}")
+        print("limit history:", [h["limit"] for h in limiter.history])
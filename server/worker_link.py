@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+# Close code sent to a connection replaced by a newer one with the same name
+REPLACED_CLOSE_CODE = 4000
+
+
+class WorkerUnavailable(Exception):
+    """No laptop is connected over the reverse link."""
+
+
+class WorkerJobError(Exception):
+    """The laptop reported that a job failed (the link's equivalent of a 500)."""
+
+
+class WorkerConnection:
+    def __init__(self, websocket: WebSocket, hello: dict):
+        self.websocket = websocket
+        self.name = hello.get("worker") or "unknown"
+        self.model = hello.get("model")
+        self.max_jobs = hello.get("max_jobs") or 1
+        self.connected_at = time.time()
+        self.last_seen = time.monotonic()
+        # job id -> (future for the result, optional chunk callback)
+        self.pending = {}
+
+    async def send(self, message: dict):
+        await self.websocket.send_text(json.dumps(message))
+
+    def fail_pending(self, error: Exception):
+        for future, _ in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+
+class WorkerHub:
+    """
+    Laptops connected to the gateway over /workers/connect.
+
+    Each laptop keeps one WebSocket open to the gateway; generation jobs are
+    multiplexed over it by id and go to the least loaded laptop with a free
+    slot. The hub pings every LINK_HEARTBEAT_SECONDS and drops a laptop that
+    has been silent for three intervals, failing its in-flight jobs.
+    """
+
+    def __init__(self):
+        self.workers = {}
+        self._slot_freed = asyncio.Condition()
+
+    def available(self) -> bool:
+        return bool(self.workers)
+
+    def snapshot(self) -> list:
+        return [
+            {
+                "worker": w.name,
+                "model": w.model,
+                "in_flight": len(w.pending),
+                "max_jobs": w.max_jobs,
+                "connected_at": w.connected_at,
+            }
+            for w in self.workers.values()
+        ]
+
+    async def _heartbeat(self, worker: WorkerConnection):
+        interval = settings.LINK_HEARTBEAT_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            if time.monotonic() - worker.last_seen > interval * 3:
+                logger.warning(f"Worker {worker.name} missed heartbeats, dropping it")
+                await worker.websocket.close()
+                return
+            try:
+                await worker.send({"type": "ping"})
+            except Exception:
+                # The receive loop notices the broken connection and cleans up
+                return
+
+    async def _notify_slot_freed(self):
+        async with self._slot_freed:
+            self._slot_freed.notify_all()
+
+    async def serve(self, websocket: WebSocket):
+        """Runs one laptop's connection until it disconnects."""
+        if websocket.headers.get("x-secret") != settings.LAPTOP_SHARED_SECRET:
+            logger.warning("Rejected worker connection with invalid secret")
+            await websocket.close(code=1008)
+            return
+
+        await websocket.accept()
+        hello = json.loads(await websocket.receive_text())
+        worker = WorkerConnection(websocket, hello)
+        # The laptop derives its dead-link timeout from our ping interval
+        await worker.send(
+            {"type": "welcome", "heartbeat_seconds": settings.LINK_HEARTBEAT_SECONDS}
+        )
+        # A reconnecting laptop replaces its previous connection. Close the old
+        # one so its heartbeat stops and, if it is actually another laptop with
+        # the same WORKER_NAME, that laptop hears about it instead of idling.
+        previous = self.workers.get(worker.name)
+        if previous:
+            logger.warning(f"Worker {worker.name} replaced its previous connection")
+            previous.fail_pending(ConnectionError(f"Worker {worker.name} reconnected"))
+            try:
+                await previous.websocket.close(
+                    code=REPLACED_CLOSE_CODE,
+                    reason="Replaced by a newer connection with the same worker name",
+                )
+            except Exception:
+                pass
+        self.workers[worker.name] = worker
+        logger.info(
+            f"Worker {worker.name} connected (model: {worker.model}, max jobs: {worker.max_jobs})"
+        )
+        await self._notify_slot_freed()
+
+        heartbeat = asyncio.create_task(self._heartbeat(worker))
+        try:
+            while True:
+                message = json.loads(await websocket.receive_text())
+                worker.last_seen = time.monotonic()
+                entry = worker.pending.get(message.get("id"))
+                if message["type"] == "chunk" and entry and entry[1]:
+                    try:
+                        await entry[1](message["text"])
+                    except Exception as e:
+                        # A failing consumer must not take the whole link down
+                        logger.warning(f"Chunk callback failed: {e}")
+                elif message["type"] == "result" and entry:
+                    del worker.pending[message["id"]]
+                    entry[0].set_result(message["response"])
+                    await self._notify_slot_freed()
+                elif message["type"] == "error" and entry:
+                    del worker.pending[message["id"]]
+                    entry[0].set_exception(WorkerJobError(message["detail"]))
+                    await self._notify_slot_freed()
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            heartbeat.cancel()
+            if self.workers.get(worker.name) is worker:
+                del self.workers[worker.name]
+            worker.fail_pending(ConnectionError(f"Worker {worker.name} disconnected"))
+            logger.info(f"Worker {worker.name} disconnected")
+            # Wake waiting jobs so they can fail fast if no laptop is left
+            await self._notify_slot_freed()
+
+    async def _acquire_worker(self) -> WorkerConnection:
+        async with self._slot_freed:
+            while True:
+                if not self.workers:
+                    raise WorkerUnavailable("No laptop connected over the reverse link")
+                free = [w for w in self.workers.values() if len(w.pending) < w.max_jobs]
+                if free:
+                    return min(free, key=lambda w: len(w.pending) / w.max_jobs)
+                await self._slot_freed.wait()
+
+    async def generate(
+        self,
+        payload: dict,
+        on_chunk: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> dict:
+        """Runs one generation on a connected laptop and returns its response."""
+        worker = await self._acquire_worker()
+        job_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        worker.pending[job_id] = (future, on_chunk)
+        try:
+            await worker.send(
+                {
+                    "type": "job",
+                    "id": job_id,
+                    "stream": on_chunk is not None,
+                    "request": payload,
+                }
+            )
+        except Exception:
+            worker.pending.pop(job_id, None)
+            raise
+        return await future
+
+
+worker_hub = WorkerHub()